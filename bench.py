@@ -0,0 +1,283 @@
+import os, sys, time
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from PIL import Image
+
+# ====================
+# benchmarks
+# ====================
+# builds node graphs without showing a window and times them.
+# usage: python bench.py [name ...]   (no names = run everything)
+
+BENCHES = {}
+def bench(fn):
+    BENCHES[fn.__name__] = fn
+    return fn
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t
+        best = dt if best is None else min(best, dt)
+    return best * 1000
+
+def test_image(w, h):
+    return Image.effect_noise((w, h), 60).convert("RGBA")
+
+def make_graph(img):
+    """empty scene with input/output already placed, input holding img"""
+    from core_ui import NodeScene
+    from system_nodes import InputNode, OutputNode
+    out = OutputNode()
+    scene = NodeScene(out)
+    inp = InputNode()
+    inp.image = img
+    scene.addItem(inp)
+    scene.addItem(out)
+    return scene, inp, out
+
+def add(scene, name, **vals):
+    """places a node from the registry, vals are input widget values by socket name"""
+    from registry import NODE_REGISTRY
+    node = NODE_REGISTRY[name]()
+    scene.addItem(node)
+    for idx, sock in enumerate(node.inputs):
+        if sock.name in vals: node.input_widgets[idx][0].setText(str(vals[sock.name]))
+    return node
+
+def chain(scene, *nodes):
+    """connects output 0 -> input 0 down the list"""
+    for a, b in zip(nodes, nodes[1:]):
+        scene.connect(a.outputs[0], b.inputs[0])
+
+@bench
+def geometry():
+    """rotate(+scale) then crop on a big photo, fused vs one resample per node"""
+    img = test_image(6000, 4000)
+    cases = [("rotate 30 -> crop 800", None, 30, 1.0, 800),
+             ("rotate 30 x0.5 -> crop 800", None, 30, 0.5, 800),
+             ("rotate 90 -> crop 1200", None, 90, 1.0, 1200),
+             ("rotate 15 (no crop)", None, 15, 1.0, None),
+             ("bright -> rotate 30 -> crop 800", 1.3, 30, 1.0, 800)]
+    for label, bright, rot, scale, crop in cases:
+        scene, inp, out = make_graph(img)
+        nodes = [inp]
+        if bright: nodes.append(add(scene, "BrightnessNode", Factor=bright))
+        nodes.append(add(scene, "TransformNode", Rotate=rot, Scale=scale))
+        if crop: nodes.append(add(scene, "CropNode", Width=crop, Height=crop))
+        chain(scene, *nodes, out)
+
+        def unfused():
+            from PIL import ImageEnhance
+            o = ImageEnhance.Brightness(img).enhance(bright) if bright else img
+            o = o.rotate(rot, expand=True)
+            if scale != 1.0: o = o.resize((int(o.width * scale), int(o.height * scale)), Image.Resampling.BICUBIC)
+            if crop:
+                l, t = (o.width - crop) / 2, (o.height - crop) / 2
+                o = o.crop((l, t, l + crop, t + crop))
+            return o
+
+        fused = best_of(out.eval)
+        before = best_of(unfused)
+        print(f"  {label:<32} per node {before:8.1f} ms   fused {fused:8.1f} ms   x{before / fused:.1f}")
+
+    # a crop in the middle of a chain has to stay cut off, the fused result should match
+    # running every node in a graph of its own
+    from PIL import ImageChops
+    small = Image.new("RGBA", (400, 400), (0, 200, 0, 255))
+    clipped = [("crop 100 -> rotate 45", [("CropNode", {"Width": 100, "Height": 100}), ("TransformNode", {"Rotate": 45})]),
+               ("crop 50 -> crop 200", [("CropNode", {"Width": 50, "Height": 50}), ("CropNode", {"Width": 200, "Height": 200})]),
+               ("crop 100 -> rotate 30 x0.5", [("CropNode", {"Width": 100, "Height": 100}), ("TransformNode", {"Rotate": 30, "Scale": 0.5})]),
+               ("grayscale -> crop 600", [("GrayscaleNode", {}), ("CropNode", {"Width": 600, "Height": 600})])]
+    for label, specs in clipped:
+        scene, inp, out = make_graph(small)
+        chain(scene, inp, *[add(scene, name, **vals) for name, vals in specs], out)
+        fused = scene.evaluate(out)
+        per_node = small
+        for name, vals in specs:
+            scene, inp, out = make_graph(per_node)
+            chain(scene, inp, add(scene, name, **vals), out)
+            per_node = scene.evaluate(out)
+        diff = max(hi for lo, hi in ImageChops.difference(fused, per_node).getextrema())
+        print(f"  {label:<32} max diff vs per node {diff}")
+
+@bench
+def blur():
+    """gaussian blur on a big photo across radii, exact vs fast path"""
+    from PIL import ImageChops, ImageDraw, ImageStat
+    from nodes_lib import blur_error_bound
+    # noise alone blurs to flat grey, shapes give the fast path edges to get wrong
+    img = test_image(6000, 4000)
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        draw.ellipse([i * 480, (i * 700) % 3000, i * 480 + 900, (i * 700) % 3000 + 900], fill=(40 * i % 256, 255 - 20 * i, 90, 255))
+    for rad in (10, 25, 50, 100, 200):
+        scene, inp, out = make_graph(img)
+        exact = add(scene, "BlurNode", Radius=rad, Accuracy=0)
+        fast = add(scene, "BlurNode", Radius=rad, Accuracy=8)
+        chain(scene, inp, exact)
+        chain(scene, inp, fast)
+        ms_exact, ms_fast = best_of(exact.eval, 2), best_of(fast.eval, 2)
+        diff = ImageChops.difference(exact.eval(), fast.eval())
+        worst = max(hi for _, hi in diff.getextrema())
+        mean = max(ImageStat.Stat(diff).mean)
+        bound_max, bound_mean = blur_error_bound(8)
+        ok = "ok" if worst <= bound_max and mean <= bound_mean else "OVER THE DOCUMENTED BOUND"
+        print(f"  radius {rad:<5} exact {ms_exact:8.1f} ms   accuracy 8 {ms_fast:8.1f} ms   "
+              f"error max {worst:3} mean {mean:5.2f} (bound {bound_max:.0f} / {bound_mean:.0f}) {ok}")
+
+@bench
+def allocations():
+    """brightness -> layer a rect -> mix with a contrast branch, copying vs in place"""
+    img = test_image(6000, 4000)
+    scene, inp, out = make_graph(img)
+    bright = add(scene, "BrightnessNode", Factor=1.2)
+    rect = add(scene, "DrawRectNode")
+    layer = add(scene, "LayerNode")
+    contrast = add(scene, "ContrastNode", Factor=1.5)
+    mix = add(scene, "MixNode", Factor=0.5)
+    chain(scene, inp, bright, layer, mix, out)
+    chain(scene, inp, contrast)
+    scene.connect(rect.outputs[0], layer.inputs[1])
+    scene.connect(contrast.outputs[0], mix.inputs[1])
+    for in_place in (False, True):
+        ms = best_of(lambda: scene.evaluate(out, in_place))
+        stats = scene.last_stats
+        print(f"  in place {str(in_place):<6} {ms:8.1f} ms   allocs {stats['allocs']:3}   "
+              f"in place {stats['in_place']}   copies {stats['copies']}   evals {stats['evals']}")
+
+@bench
+def shapes():
+    """stacking generated rects onto a big photo, layered lazily vs a full canvas per rect"""
+    img = test_image(6000, 4000)
+    for count in (1, 10, 50):
+        scene, inp, out = make_graph(img)
+        prev = inp
+        for i in range(count):
+            rect = add(scene, "DrawRectNode", **{"X Position": 40 * i, "Y Position": 30 * i, "Width": 300, "Height": 200})
+            layer = add(scene, "LayerNode")
+            chain(scene, prev, layer)
+            scene.connect(rect.outputs[0], layer.inputs[1])
+            prev = layer
+        chain(scene, prev, out)
+
+        def canvas_per_rect():
+            from PIL import ImageDraw
+            o = img
+            for i in range(count):
+                c = Image.new("RGBA", o.size, (0, 0, 0, 0))
+                ImageDraw.Draw(c).rectangle([40 * i, 30 * i, 40 * i + 300, 30 * i + 200], fill=(255, 0, 0, 255))
+                o = o.copy()
+                o.alpha_composite(c)
+            return o
+
+        print(f"  {count:3} rects   canvas per rect {best_of(canvas_per_rect):8.1f} ms   layered {best_of(lambda: scene.evaluate(out)):8.1f} ms"
+              f"   allocs {scene.last_stats['allocs']}")
+
+@bench
+def dedupe():
+    """duplicated blur/brightness/width nodes feeding two outputs, with and without dedupe"""
+    img = test_image(4000, 3000)
+    scene, inp, out = make_graph(img)
+    branches = []
+    for _ in range(2):
+        # the same chain built twice, like copy-pasting nodes
+        blur = add(scene, "BlurNode", Radius=12, Accuracy=0)
+        bright = add(scene, "BrightnessNode", Factor=1.3)
+        width = add(scene, "GetImageWidthNode")
+        half = add(scene, "FloatMultiplyNode")
+        crop = add(scene, "CropNode", Height=800)
+        chain(scene, inp, blur, bright, crop)
+        chain(scene, bright, width, half)
+        scene.connect(add(scene, "FloatNode", Value=0.5).outputs[0], half.inputs[1])
+        scene.connect(half.outputs[0], crop.inputs[1])
+        branches.append((bright, crop))
+    mix = add(scene, "MixNode")
+    scene.connect(branches[0][0].outputs[0], mix.inputs[0])
+    scene.connect(branches[1][0].outputs[0], mix.inputs[1])
+    roots = [mix, branches[0][1], branches[1][1]]
+    for dedupe in (False, True):
+        ms = best_of(lambda: scene.evaluate_many(roots, dedupe=dedupe))
+        stats = scene.last_stats
+        print(f"  dedupe {str(dedupe):<6} {ms:8.1f} ms   nodes {stats['nodes']}   evals {stats['evals']}   deduped {stats['deduped']}")
+
+@bench
+def folding():
+    """rects placed by float math off one shared input, constants folded on edit vs walked on every read"""
+    img = test_image(2000, 1500)
+    scene, inp, out = make_graph(img)
+    base = add(scene, "FloatNode", Value=40)
+    prev = inp
+    for i in range(20):
+        # x = base * i + 10, y = sqrt(x) * 8, w = h = base / 2
+        x, y = add(scene, "FloatAddNode"), add(scene, "FloatMultiplyNode")
+        times, root = add(scene, "FloatMultiplyNode"), add(scene, "FloatSqrtNode")
+        size = add(scene, "FloatDivideNode")
+        scene.connect(base.outputs[0], times.inputs[0])
+        scene.connect(add(scene, "FloatNode", Value=i).outputs[0], times.inputs[1])
+        scene.connect(times.outputs[0], x.inputs[0])
+        scene.connect(add(scene, "FloatNode", Value=10).outputs[0], x.inputs[1])
+        chain(scene, x, root, y)
+        scene.connect(add(scene, "FloatNode", Value=8).outputs[0], y.inputs[1])
+        scene.connect(base.outputs[0], size.inputs[0])
+        scene.connect(add(scene, "FloatNode", Value=2).outputs[0], size.inputs[1])
+        rect, layer = add(scene, "DrawRectNode"), add(scene, "LayerNode")
+        for idx, src in enumerate((x, y, size, size)): scene.connect(src.outputs[0], rect.inputs[idx])
+        chain(scene, prev, layer)
+        scene.connect(rect.outputs[0], layer.inputs[1])
+        prev = layer
+    chain(scene, prev, out)
+
+    def unfolded(fn):
+        # as if fold_constants had never run
+        for item in scene.items():
+            if hasattr(item, "folded"): item.folded = False
+        return fn()
+
+    fold = best_of(scene.fold_constants)
+    for label, fn in (("eval", out.eval), ("graph run", lambda: scene.evaluate(out))):
+        walked = best_of(lambda: unfolded(fn))
+        scene.fold_constants()
+        print(f"  {label:<10} walked {walked:8.1f} ms   folded {best_of(fn):8.1f} ms")
+    unfolded(lambda: scene.evaluate(out))
+    walked = scene.last_stats["evals"]
+    scene.fold_constants()
+    scene.evaluate(out)
+    print(f"  graph run evals walked {walked}   folded {scene.last_stats['evals']}   folding itself {fold:.1f} ms")
+
+@bench
+def sequence():
+    """blur + generated rect over animated gifs of growing length, streamed one frame at a time"""
+    import tempfile
+    from sequence import GifWriter, render_sequence
+    try: import resource
+    except ImportError: resource = None # windows
+    scene, inp, out = make_graph(None)
+    blur, rect, layer = add(scene, "BlurNode", Radius=6), add(scene, "DrawRectNode"), add(scene, "LayerNode")
+    chain(scene, inp, blur, layer, out)
+    scene.connect(rect.outputs[0], layer.inputs[1])
+    frame = test_image(640, 480)
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (25, 100, 400):
+            src, dst = os.path.join(tmp, f"in{count}.gif"), os.path.join(tmp, f"out{count}.gif")
+            with open(src, "wb") as fp:
+                w = GifWriter(fp)
+                for i in range(count): w.add(frame.rotate(i * 3), 40)
+                w.close()
+            t = time.perf_counter()
+            stats = render_sequence(scene, inp, out, src, dst)
+            ms = (time.perf_counter() - t) * 1000
+            peak = f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB" if resource else "n/a"
+            print(f"  {count:4} frames   {ms / count:6.1f} ms/frame   evals {stats['evals']:5}   kept {stats['kept']:4}   peak rss so far {peak}")
+
+def main(names):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    for name in names or BENCHES:
+        print(f"{name}: {BENCHES[name].__doc__}")
+        BENCHES[name]()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,10 +1,24 @@
+import sys
 import PyInstaller.__main__
+from registry import NODE_MODULES, check_registry
+
+# the hidden imports below come from NODE_MODULES, so it has to be complete
+problems = check_registry()
+if problems: sys.exit("node registry out of date:\n  " + "\n  ".join(problems))
+
+# --onedir by default: a --onefile build unpacks the whole bundle to a temp dir
+# on every launch, which is most of its startup time. pass --onefile if you
+# really want a single exe.
+mode = '--onefile' if '--onefile' in sys.argv[1:] else '--onedir'
 
 PyInstaller.__main__.run([
     'main.py',
     '--name=PhotoNodes EX',
-    '--onefile',
+    mode,
     '--noconsole',
     '--icon=ICON.ico',
     '--add-data=ICON.ico;.',
-])
\ No newline at end of file
+] + [
+    # node modules are only imported through the registry so pyinstaller can't see them
+    f'--hidden-import={m}' for m in sorted(set(NODE_MODULES.values()))
+])
@@ -11,6 +11,7 @@ C_GRID_LINES = QColor(40, 40, 40)
 C_NODE_BODY    = QColor(20, 20, 20, 180) # semi-transparent dark
 C_NODE_BORDER  = QColor(10, 10, 10)
 C_NODE_SEL     = QColor(255, 200, 0)     # selection
+C_NODE_ERROR   = QColor(255, 60, 60)     # constant that failed to fold
 
 # header colors
 C_HEADER_DEFAULT = QColor(50, 50, 50)
@@ -1,7 +1,22 @@
 from PySide6.QtWidgets import QGraphicsItem, QGraphicsPathItem, QGraphicsProxyWidget, QLineEdit, QGraphicsScene, QGraphicsView
 from PySide6.QtCore import Qt, QRectF, QPointF
 from PySide6.QtGui import QPainter, QPainterPath, QPen, QBrush, QLinearGradient, QFont, QDoubleValidator, QFontMetrics
+from PIL import Image
+from layers import ShapeLayer
 from config import *
+from functools import lru_cache
+import weakref
+
+# building a QFontMetrics for every socket label was a big chunk of node creation time,
+# so share one and remember the widths we already measured
+_label_metrics = None
+
+@lru_cache(maxsize=None)
+def label_width(text):
+    global _label_metrics
+    if _label_metrics is None:
+        _label_metrics = QFontMetrics(QFont("Segoe UI", 8, QFont.Bold))
+    return _label_metrics.horizontalAdvance(text)
 
 # ==========================================
 # socket
@@ -96,6 +111,10 @@ class BaseNode(QGraphicsItem):
         self.inputs = []
         self.outputs = []
         self.input_widgets = {} 
+        # set by NodeScene.fold_constants
+        self.folded = False
+        self.const = None
+        self.fold_error = None
         
         self.setFlags(QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemSendsGeometryChanges)
 
@@ -110,9 +129,7 @@ class BaseNode(QGraphicsItem):
         idx = len(self.inputs)
         
         # calculate width needed for label
-        font = QFont("Segoe UI", 8, QFont.Bold)
-        fm = QFontMetrics(font)
-        text_w = fm.horizontalAdvance(name)
+        text_w = label_width(name)
         
         has_widget = False
         widget_w = 0
@@ -163,13 +180,23 @@ class BaseNode(QGraphicsItem):
         m = max(len(self.inputs), len(self.outputs))
         self.height = 50 + (m * 28) + 10
 
+    def current_run(self):
+        """the GraphRun evaluating this node right now, if any"""
+        scene = self.scene()
+        return getattr(scene, "run", None) if scene is not None else None
+
     def get_input_val(self, index, default=None):
         if index < len(self.inputs):
             sock = self.inputs[index]
             if sock.connected_edges:
                 edge = sock.connected_edges[0] 
                 if edge.start_socket:
-                    val = edge.start_socket.parent_node.eval()
+                    up = edge.start_socket.parent_node
+                    if up.folded: val = up.const
+                    else:
+                        run = self.current_run()
+                        val = run.value(up) if run else up.eval()
+                    if isinstance(val, ShapeLayer) and not self.accepts_layers: val = val.render()
                     if val is not None: return val
         
         if index in self.input_widgets:
@@ -179,6 +206,39 @@ class BaseNode(QGraphicsItem):
             
         return default
         
+    def take_input(self, index, default=None):
+        """
+        get_input_val for an image you want to change in place. you get the upstream
+        image itself when this node is its only consumer in the current run, otherwise a copy
+        """
+        up = self.input_node(index)
+        if up is None: return default
+        run = self.current_run()
+        if run: val = run.take(up)
+        else:
+            val = up.eval()
+            if val is not None: val = val.copy()
+        if isinstance(val, ShapeLayer) and not self.accepts_layers: val = val.render()
+        return default if val is None else val
+
+    def input_node(self, index):
+        """node feeding input `index`, or None if nothing is plugged in"""
+        if index < len(self.inputs):
+            sock = self.inputs[index]
+            if sock.connected_edges and sock.connected_edges[0].start_socket:
+                return sock.connected_edges[0].start_socket.parent_node
+        return None
+
+    def input_problem(self):
+        """what's wrong with an input that has nothing usable in it, or None"""
+        for idx, sock in enumerate(self.inputs):
+            if self.input_node(idx) is not None: continue
+            if idx not in self.input_widgets: return f"{sock.name} isn't connected"
+            text = self.input_widgets[idx][0].text()
+            try: float(text)
+            except ValueError: return f"{sock.name} isn't a number ({text!r})"
+        return None
+
     def update_widgets(self):
         for idx, (widget, _) in self.input_widgets.items():
             sock = self.inputs[idx]
@@ -213,8 +273,8 @@ class BaseNode(QGraphicsItem):
         painter.drawPath(path_body)
 
         # outline
-        color = C_NODE_SEL if self.isSelected() else C_NODE_BORDER
-        width = 2 if self.isSelected() else 1
+        color = C_NODE_SEL if self.isSelected() else C_NODE_ERROR if self.fold_error else C_NODE_BORDER
+        width = 2 if self.isSelected() or self.fold_error else 1
         painter.setPen(QPen(color, width))
         painter.setBrush(Qt.NoBrush)
         painter.drawRoundedRect(0, 0, self.width, self.height, 8, 8)
@@ -224,8 +284,156 @@ class BaseNode(QGraphicsItem):
         painter.setFont(QFont("Segoe UI", 9, QFont.Bold))
         painter.drawText(QRectF(10, 0, self.width - 20, 30), Qt.AlignVCenter, self.name.upper())
 
+    # False for nodes that hand out an image they keep (like the input node),
+    # those can never be changed in place
+    owns_result = True
+    # True for nodes whose output changes without the graph being edited (the input image)
+    is_source = False
+    # True for nodes that can deal with a lazy ShapeLayer, everyone else gets it rendered
+    accepts_layers = False
+    # True for nodes that only turn numbers/colours into numbers/colours, those get
+    # folded to a constant on edit when nothing image related feeds them
+    is_scalar = False
+
     def eval(self): return None
 
+# ==========================================
+# graph run
+# ==========================================
+class GraphRun:
+    """
+    one evaluation of the graph from one or more root nodes. nodes are keyed by what they
+    compute (type, input values and the keys of whatever feeds them) so duplicated nodes
+    and subgraphs are evaluated once, and each result is shared between its consumers,
+    then dropped as soon as the last one has it. a node that's the only consumer of an
+    image it didn't get from elsewhere can take it and change it in place
+    (BaseNode.take_input) instead of copying.
+
+    folded constants (NodeScene.fold_constants) are read straight off their node, the
+    run never walks the scalar chains behind them.
+
+    `keep` is an optional dict that outlives the run: results of nodes that don't depend
+    on a source node (the input image) are stored there and reused by later runs of the
+    same, unedited graph
+    """
+    def __init__(self, roots, in_place=True, keep=None, dedupe=True):
+        if not isinstance(roots, (list, tuple)): roots = [roots]
+        self.in_place = in_place
+        self.keep = keep
+        self.dedupe = dedupe
+        self.keys = {}
+        self.results = {}
+        self.fresh = {}
+        self.consumers = {}
+        # images that somebody else still holds, by id
+        self.shared = weakref.WeakValueDictionary()
+        self.stats = {"nodes": 0, "deduped": 0, "evals": 0, "kept": 0, "in_place": 0, "copies": 0, "allocs": 0}
+        self._allocs = Image.core.get_stats()["new_count"]
+
+        for root in roots: self.key(root)
+        # only one node per key ever gets evaluated, so only its inputs get read
+        evaluated = {}
+        for node, key in self.keys.items(): evaluated.setdefault(key, node)
+        for node in evaluated.values():
+            if node.folded: continue
+            for i in range(len(node.inputs)):
+                up = node.input_node(i)
+                if up is not None and not up.folded: self._add_consumer(self.keys[up])
+        # whoever asked for the roots holds on to them too
+        for root in roots: self._add_consumer(self.keys[root])
+        self.remaining = dict(self.consumers)
+        self.stats["nodes"] = len(self.keys)
+        self.stats["deduped"] = len(self.keys) - len(evaluated)
+        self.static = self._static_keys() if keep is not None else set()
+
+    def _add_consumer(self, key):
+        self.consumers[key] = self.consumers.get(key, 0) + 1
+
+    def key(self, node):
+        """what node computes, equal for nodes that would give the same result"""
+        if node in self.keys: return self.keys[node]
+        if node.folded:
+            # the same value from two folded nodes is only one node's work with dedupe on
+            key = self.keys[node] = ("const", node.const if self.dedupe else id(node))
+            return key
+        parts = []
+        for i, sock in enumerate(node.inputs):
+            up = None
+            if sock.connected_edges and sock.connected_edges[0].start_socket:
+                out = sock.connected_edges[0].start_socket
+                up = (self.key(out.parent_node), out.index)
+            # an input falls back to its widget when the upstream value is None
+            val = None
+            if i in node.input_widgets:
+                val = node.input_widgets[i][0].text()
+                try: val = float(val)
+                except ValueError: pass
+            parts.append((up, val))
+        if node.is_source or not self.dedupe:
+            key = (type(node).__name__, id(node))
+        else:
+            key = (type(node).__name__, tuple(parts))
+        self.keys[node] = key
+        return key
+
+    def _static_keys(self):
+        """the keys whose result doesn't depend on any source node"""
+        varies = {}
+        def check(node):
+            if node not in varies:
+                varies[node] = node.is_source
+                for i in range(len(node.inputs)):
+                    up = node.input_node(i)
+                    if up is not None and check(up): varies[node] = True
+            return varies[node]
+        return {key for node, key in list(self.keys.items()) if not check(node)}
+
+    def consumer_count(self, node):
+        return self.consumers.get(self.key(node), 0)
+
+    def value(self, node):
+        if node.folded: return node.const
+        key = self.key(node)
+        if key in self.results:
+            val = self.results[key]
+        elif key in self.static and key in self.keep:
+            val = self.results[key] = self.keep[key]
+            self.fresh[key] = False
+            self.stats["kept"] += 1
+            if isinstance(val, Image.Image): self.shared[id(val)] = val
+        else:
+            val = node.eval()
+            self.stats["evals"] += 1
+            # a node handing back one of its inputs doesn't own that image
+            self.fresh[key] = node.owns_result and id(val) not in self.shared
+            if key in self.static:
+                # kept for later runs, so nobody gets to change it
+                self.keep[key] = val
+                self.fresh[key] = False
+            if isinstance(val, Image.Image) and (not self.fresh[key] or self.consumers.get(key, 0) > 1):
+                self.shared[id(val)] = val
+            self.results[key] = val
+
+        left = self.remaining.get(key, 0) - 1
+        self.remaining[key] = left
+        if left <= 0: self.results.pop(key, None)
+        return val
+
+    def take(self, node):
+        val = self.value(node)
+        if not isinstance(val, Image.Image): return val
+        key = self.key(node)
+        if self.in_place and self.fresh.get(key) and self.consumers.get(key) == 1:
+            self.stats["in_place"] += 1
+            return val
+        self.stats["copies"] += 1
+        return val.copy()
+
+    def finish(self):
+        self.results.clear()
+        self.stats["allocs"] = Image.core.get_stats()["new_count"] - self._allocs
+        return self.stats
+
 # ==========================================
 # scene
 # ==========================================
@@ -236,11 +444,77 @@ class NodeScene(QGraphicsScene):
         self.active_edge = None
         self.setSceneRect(0, 0, 5000, 5000)
         self.setBackgroundBrush(QBrush(C_BG_VIEW))
+        self.run = None
+        self.last_stats = None
+        self.fold_errors = []
+
+    def evaluate(self, node, in_place=True, keep=None, dedupe=True):
+        """evaluates node in its own GraphRun, the run's stats end up in last_stats"""
+        return self.evaluate_many([node], in_place, keep, dedupe)[0]
+
+    def evaluate_many(self, nodes, in_place=True, keep=None, dedupe=True):
+        """evaluates several nodes in one GraphRun, so anything they have in common is only done once"""
+        self.run = GraphRun(nodes, in_place, keep, dedupe)
+        try:
+            return [self.run.value(node) for node in nodes]
+        finally:
+            self.last_stats = self.run.finish()
+            self.run = None
+
+    def fold_constants(self):
+        """
+        works out every scalar node that nothing image related feeds, once per edit instead
+        of on every read during a render. a node the output reads that fails (divide by zero,
+        sqrt of a negative, a missing input) is marked and listed in fold_errors, its consumers
+        fall back to their own widget values so the render still goes through. failing nodes
+        nothing reads yet are left alone, they don't break anything
+        """
+        nodes = [item for item in self.items() if isinstance(item, BaseNode)]
+        for node in nodes: node.folded, node.const = False, None
+        errors = {}
+        broken = set() # failed, or fed by something that failed
+        done = {}
+
+        def fold(node):
+            if node in done: return done[node]
+            done[node] = False # loops never fold
+            if not node.is_scalar: return False
+            ups = [up for up in map(node.input_node, range(len(node.inputs))) if up is not None]
+            if not all(fold(up) for up in ups): return False
+            if any(up in broken for up in ups):
+                broken.add(node) # the upstream error is the one worth showing
+            else:
+                try: node.const = node.eval()
+                except (ArithmeticError, ValueError, TypeError) as e:
+                    errors[node] = node.input_problem() or str(e)
+                    broken.add(node)
+            node.folded = done[node] = True
+            return True
+
+        for node in nodes: fold(node)
+        # only errors the output actually runs into count
+        read = set()
+        todo = [self.output_node] if self.output_node else []
+        while todo:
+            node = todo.pop()
+            if node in read: continue
+            read.add(node)
+            todo.extend(up for up in map(node.input_node, range(len(node.inputs))) if up is not None)
+        errors = {node: err for node, err in errors.items() if node in read}
+        for node in nodes:
+            err = errors.get(node)
+            if err != node.fold_error:
+                node.fold_error = err
+                node.setToolTip(err or "")
+                node.update()
+        self.fold_errors = [f"{node.name}: {err}" for node, err in errors.items()]
+        return self.fold_errors
 
     def trigger_eval(self):
         for item in self.items():
             if isinstance(item, BaseNode):
                 item.update_widgets()
+        self.fold_constants()
         if self.output_node: self.output_node.refresh()
 
     def keyPressEvent(self, event):
@@ -265,6 +539,19 @@ class NodeScene(QGraphicsScene):
         self.removeItem(edge)
         self.trigger_eval()
 
+    def connect(self, out_sock, in_sock, edge=None):
+        """wires an output socket into an input socket, replacing whatever was plugged in there"""
+        if in_sock.connected_edges: self.remove_edge(in_sock.connected_edges[0])
+        if edge is None:
+            edge = Edge(out_sock)
+            self.addItem(edge)
+        edge.end_socket = in_sock
+        out_sock.connected_edges.append(edge)
+        in_sock.connected_edges.append(edge)
+        edge.update_path()
+        self.trigger_eval()
+        return edge
+
     def mousePressEvent(self, event):
         item = self.itemAt(event.scenePos(), self.views()[0].transform())
         
@@ -289,12 +576,7 @@ class NodeScene(QGraphicsScene):
             item = self.itemAt(event.scenePos(), self.views()[0].transform())
             if isinstance(item, Socket) and item.socket_type == "input":
                 if self.active_edge.start_socket.data_type == item.data_type or item.data_type == "ANY":
-                    if item.connected_edges: self.remove_edge(item.connected_edges[0])
-                    self.active_edge.end_socket = item
-                    self.active_edge.start_socket.connected_edges.append(self.active_edge)
-                    item.connected_edges.append(self.active_edge)
-                    self.active_edge.update_path()
-                    self.trigger_eval()
+                    self.connect(self.active_edge.start_socket, item, self.active_edge)
                 else:
                     self.removeItem(self.active_edge)
             else:
@@ -0,0 +1,92 @@
+from core_ui import NodeScene, BaseNode
+from system_nodes import InputNode, OutputNode
+from registry import NODE_REGISTRY
+
+# ====================
+# graph files
+# ====================
+# a graph as plain json, used by the render server and "Save Graph":
+#
+# {
+#   "nodes": {
+#     "in":   {"type": "InputNode"},
+#     "blur": {"type": "BlurNode", "values": {"Radius": 20}, "pos": [400, 300]},
+#     "out":  {"type": "OutputNode"}
+#   },
+#   "links": [
+#     {"from": "in", "to": "blur", "input": "Image"},
+#     {"from": "blur", "to": "out", "input": "Image"}
+#   ]
+# }
+#
+# "input" is the socket name (or index) on the receiving node, "output" defaults to 0.
+
+SYSTEM_NODES = {"InputNode": InputNode, "OutputNode": OutputNode}
+
+def _socket_index(node, key):
+    if isinstance(key, int): return key
+    for i, sock in enumerate(node.inputs):
+        if sock.name == key: return i
+    raise ValueError(f"{type(node).__name__} has no input called {key!r}")
+
+def load_graph(data):
+    """builds a graph dict into a new scene. returns (scene, input node or None, output node, nodes by id)"""
+    nodes = {}
+    for node_id, spec in data.get("nodes", {}).items():
+        kind = spec.get("type")
+        cls = SYSTEM_NODES.get(kind) or NODE_REGISTRY.get(kind)
+        if cls is None: raise ValueError(f"unknown node type {kind!r} ({node_id})")
+        node = cls()
+        for key, val in spec.get("values", {}).items():
+            idx = _socket_index(node, key)
+            if idx not in node.input_widgets: raise ValueError(f"{node_id}: input {key!r} has no value to set")
+            node.input_widgets[idx][0].setText(str(val))
+        if "pos" in spec: node.setPos(*spec["pos"])
+        nodes[node_id] = node
+
+    outs = [n for n in nodes.values() if isinstance(n, OutputNode)]
+    ins = [n for n in nodes.values() if isinstance(n, InputNode)]
+    if len(outs) != 1: raise ValueError("graph needs exactly one OutputNode")
+    if len(ins) > 1: raise ValueError("graph can have at most one InputNode")
+
+    scene = NodeScene(outs[0])
+    for node in nodes.values(): scene.addItem(node)
+    for link in data.get("links", []):
+        try:
+            src, dst = nodes[link["from"]], nodes[link["to"]]
+        except KeyError as e:
+            raise ValueError(f"link to unknown node {e.args[0]!r}")
+        out_idx = link.get("output", 0)
+        in_idx = _socket_index(dst, link.get("input", 0))
+        if out_idx >= len(src.outputs) or in_idx >= len(dst.inputs):
+            raise ValueError(f"bad socket in link {link}")
+        scene.connect(src.outputs[out_idx], dst.inputs[in_idx])
+    scene.fold_constants()
+    return scene, (ins[0] if ins else None), outs[0], nodes
+
+def dump_graph(scene):
+    """the graph in a scene as a dict load_graph can read back"""
+    ids = {}
+    counts = {}
+    data = {"nodes": {}, "links": []}
+    nodes = [item for item in scene.items() if isinstance(item, BaseNode)]
+    for node in sorted(nodes, key=lambda n: (n.pos().x(), n.pos().y())):
+        kind = type(node).__name__
+        counts[kind] = counts.get(kind, 0) + 1
+        node_id = ids[node] = f"{kind}{counts[kind]}"
+        spec = {"type": kind, "pos": [node.pos().x(), node.pos().y()]}
+        values = {}
+        for idx, (widget, _) in node.input_widgets.items():
+            try: values[node.inputs[idx].name] = float(widget.text())
+            except ValueError: pass
+        if values: spec["values"] = values
+        data["nodes"][node_id] = spec
+
+    for node in ids:
+        for idx, sock in enumerate(node.inputs):
+            for edge in sock.connected_edges:
+                if edge.start_socket and edge.start_socket.parent_node in ids:
+                    src = edge.start_socket.parent_node
+                    data["links"].append({"from": ids[src], "output": src.outputs.index(edge.start_socket),
+                                          "to": ids[node], "input": sock.name})
+    return data
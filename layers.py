@@ -0,0 +1,56 @@
+from PIL import Image
+
+# ====================
+# procedural layers
+# ====================
+# generator nodes hand out one of these instead of drawing onto a canvas of their own.
+# it's just a list of shapes in the pixel coordinates of whatever it gets composited
+# onto, so layering it only touches the pixels the shapes cover and nothing is resampled.
+
+LAYER_CANVAS = 512 # smallest canvas used when a node needs the layer as a plain image
+
+class ShapeLayer:
+    def __init__(self, shapes=()):
+        # (box, fill) solid colour rects, box is (left, top, right, bottom) with right/bottom exclusive
+        self.shapes = tuple(shapes)
+
+    @classmethod
+    def rect(cls, x, y, w, h, fill):
+        """same pixels as ImageDraw.rectangle([x, y, x+w, y+h], fill)"""
+        x0, x1 = sorted((x, x + w))
+        y0, y1 = sorted((y, y + h))
+        if len(fill) == 3: fill = (*fill, 255)
+        return cls([((x0, y0, x1 + 1, y1 + 1), tuple(fill))])
+
+    @property
+    def bounds(self):
+        if not self.shapes: return None
+        boxes = [box for box, _ in self.shapes]
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+    def stacked(self, other):
+        """other on top of this one, still lazy"""
+        return ShapeLayer(self.shapes + other.shapes)
+
+    def copy(self):
+        # never changed after it's made, so it can be shared
+        return self
+
+    def composite_onto(self, img):
+        """alpha composites the shapes onto img in place, only inside the boxes they cover"""
+        for (l, t, r, b), fill in self.shapes:
+            l, t, r, b = max(l, 0), max(t, 0), min(r, img.width), min(b, img.height)
+            if r <= l or b <= t or fill[3] == 0: continue
+            if fill[3] == 255:
+                img.paste(fill, (l, t, r, b))
+            else:
+                img.alpha_composite(Image.new("RGBA", (r - l, b - t), fill), (l, t))
+        return img
+
+    def render(self, size=None):
+        """the layer as a plain transparent image, by default big enough to hold every shape"""
+        if size is None:
+            _, _, r, b = self.bounds or (0, 0, 0, 0)
+            size = (max(LAYER_CANVAS, r), max(LAYER_CANVAS, b))
+        return self.composite_onto(Image.new("RGBA", size, (0, 0, 0, 0)))
@@ -1,16 +1,30 @@
-import sys
-from PIL import ImageQt
+import sys, time
+_T0 = time.perf_counter()
+
 from PySide6.QtWidgets import (QApplication, QMainWindow, QGraphicsView, QDockWidget, 
                                QListWidget, QWidget, QHBoxLayout, QPushButton, QLabel, QFileDialog)
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QPainter, QPixmap, QIcon
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QPainter, QPixmap, QIcon, QImage
 
 from config import STYLESHEET
 from utils import generate_checker_pixmap
 from core_ui import NodeScene
-from nodes_lib import InputNode, OutputNode, NODE_REGISTRY
+# the node library itself (and its PIL filters) is imported lazily through the registry
+from system_nodes import InputNode, OutputNode
+from registry import NODE_REGISTRY
+from graph_io import dump_graph
+
+import ctypes, os, json
+_T_IMPORTS = time.perf_counter()
 
-import ctypes, os
+def report_startup(marks):
+    """prints the startup marks collected with --profile-startup (profile_startup.py reads these)"""
+    prev = _T0
+    for label, t in marks:
+        print(f"startup: {label} {(t - prev) * 1000:.1f}")
+        prev = t
+    print(f"startup: total {(prev - _T0) * 1000:.1f}")
+    print(f"startup: nodes_lib loaded {'nodes_lib' in sys.modules}")
 
 def resource_path(relative_path):
     try:
@@ -81,6 +95,15 @@ class App(QMainWindow):
         b_save = QPushButton("Export Result")
         b_save.clicked.connect(self.save_img)
         l.addWidget(b_save)
+
+        b_seq = QPushButton("Export Sequence")
+        b_seq.clicked.connect(self.save_sequence)
+        l.addWidget(b_seq)
+
+        # graph files are what the render server takes as jobs
+        b_graph = QPushButton("Save Graph")
+        b_graph.clicked.connect(self.save_graph)
+        l.addWidget(b_graph)
         
         bar.setLayout(l)
         
@@ -97,7 +120,7 @@ class App(QMainWindow):
             self.scene.addItem(node)
 
     def load_img(self):
-        p, _ = QFileDialog.getOpenFileName(self, "Load", "", "Img (*.png *.jpg *.jpeg)")
+        p, _ = QFileDialog.getOpenFileName(self, "Load", "", "Img (*.png *.jpg *.jpeg *.gif *.webp *.tif *.tiff)")
         if p:
             self.in_node.set_image(p)
             self.scene.trigger_eval()
@@ -109,29 +132,75 @@ class App(QMainWindow):
         if p:
             self.current_img.save(p)
 
+    def save_sequence(self):
+        if self.in_node.frames < 2:
+            self.statusBar().showMessage("load an animated gif/webp or a multi-page tiff first")
+            return
+        p, _ = QFileDialog.getSaveFileName(self, "Export Sequence", "output.gif",
+                                           "GIF (*.gif);;WebP (*.webp);;TIFF (*.tif *.tiff)")
+        if not p: return
+        from sequence import render_sequence
+        def progress(done, total):
+            self.statusBar().showMessage(f"rendering frame {done}/{total}")
+            QApplication.processEvents()
+        try:
+            stats = render_sequence(self.scene, self.in_node, self.out_node, self.in_node.path, p, progress=progress)
+        except (ValueError, OSError) as e:
+            self.statusBar().showMessage(f"export failed: {e}")
+            return
+        self.statusBar().showMessage(f"{stats['frames']} frames written to {p}, "
+                                     f"{stats['kept']} results reused between frames")
+
+    def save_graph(self):
+        p, _ = QFileDialog.getSaveFileName(self, "Save Graph", "graph.json", "Graph (*.json)")
+        if p:
+            with open(p, "w") as f: json.dump(dump_graph(self.scene), f, indent=2)
+
     def update_view(self, img):
         self.current_img = img
+        stats = self.scene.last_stats
+        if self.scene.fold_errors:
+            self.statusBar().showMessage("  |  ".join(self.scene.fold_errors))
+        elif stats:
+            self.statusBar().showMessage(f"{stats['evals']} nodes evaluated, {stats['deduped']} duplicates skipped, "
+                                         f"{stats['allocs']} image allocations, "
+                                         f"{stats['in_place']} in place, {stats['copies']} copies")
         if not img: 
             self.lbl.setPixmap(generate_checker_pixmap())
             return
             
         im2 = img.convert("RGBA")
         data = im2.tobytes("raw", "RGBA")
-        qim = ImageQt.QImage(data, im2.size[0], im2.size[1], ImageQt.QImage.Format_RGBA8888)
+        qim = QImage(data, im2.size[0], im2.size[1], QImage.Format_RGBA8888)
         pix = QPixmap.fromImage(qim)
         self.lbl.setPixmap(pix.scaled(self.lbl.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
 
 if __name__ == "__main__":
+    profile = "--profile-startup" in sys.argv
+    marks = [("imports", _T_IMPORTS)]
+
     # this is to make it icon work on taskbar
-    myappid = 'manikomtmn.photonodesEX.whatever'
-    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
+    if sys.platform == "win32":
+        myappid = 'manikomtmn.photonodesEX.whatever'
+        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
     app = QApplication(sys.argv)
     app.setStyleSheet(STYLESHEET)
 
     icon_path = resource_path("ICON.ico") 
     app.setWindowIcon(QIcon(icon_path))
+    marks.append(("qapplication", time.perf_counter()))
 
     window = App()
+    marks.append(("window", time.perf_counter()))
     window.show()
+
+    if profile:
+        # first event loop tick = the window is actually up
+        def _done():
+            marks.append(("first show", time.perf_counter()))
+            report_startup(marks)
+            app.quit()
+        QTimer.singleShot(0, _done)
+
     sys.exit(app.exec())
\ No newline at end of file
@@ -1,75 +1,112 @@
-from PIL import Image, ImageEnhance, ImageFilter, ImageDraw, ImageOps
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ImageOps, ImageStat
 from core_ui import BaseNode
+from layers import ShapeLayer
 from config import *
 import math
 
-NODE_REGISTRY = {}
-def register_node(cls):
-    NODE_REGISTRY[cls.__name__] = cls
-    return cls
+from system_nodes import InputNode, OutputNode
+from registry import NODE_REGISTRY, register_node
 
 # ====================
-# system nodes
+# image processing
 # ====================
 
-class InputNode(BaseNode):
-    def __init__(self):
-        super().__init__("Input Image", header_color=C_HEADER_EVENT)
-        self.add_output("Image", "IMAGE")
-        self.image = None
-        self.is_permanent = True
-    
-    def set_image(self, path):
-        try:
-            self.image = Image.open(path).convert("RGBA")
-        except: pass
-    
-    def eval(self): return self.image
-
-class OutputNode(BaseNode):
-    def __init__(self, cb=None):
-        super().__init__("Output Result", header_color=C_HEADER_EVENT)
-        self.add_input("Image", "IMAGE")
-        self.cb = cb
-        self.is_permanent = True
-    
-    def refresh(self):
-        if self.cb: self.cb(self.eval())
-        
-    def eval(self):
-        return self.get_input_val(0)
+class PointwiseNode(BaseNode):
+    """
+    base for filters where an output pixel only depends on the same pixel of the image
+    input (input 0). a Transform/Crop downstream runs them on just the part it keeps
+    """
+    # True when the filter also needs a stat of its whole input (the contrast mean),
+    # then it has to be the first one to run on the source
+    needs_whole = False
 
-# ====================
-# image processing
-# ====================
+    def apply(self, img, whole):
+        """the filter on img, which is a piece of `whole` (the full input image)"""
+        raise NotImplementedError
+
+    def eval(self):
+        img = self.get_input_val(0)
+        if img: return self.apply(img, img)
+        return None
 
 @register_node
-class BrightnessNode(BaseNode):
+class BrightnessNode(PointwiseNode):
     def __init__(self):
         super().__init__("Brightness", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
         self.add_input("Factor", "FLOAT", 1.2)
         self.add_output("Image", "IMAGE")
 
-    def eval(self):
-        img = self.get_input_val(0)
+    def apply(self, img, whole):
         fac = self.get_input_val(1, 1.0)
-        if img: return ImageEnhance.Brightness(img).enhance(fac)
-        return None
+        return ImageEnhance.Brightness(img).enhance(fac)
 
 @register_node
-class ContrastNode(BaseNode):
+class ContrastNode(PointwiseNode):
+    needs_whole = True
+
     def __init__(self):
         super().__init__("Contrast", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
         self.add_input("Factor", "FLOAT", 1.5)
         self.add_output("Image", "IMAGE")
 
-    def eval(self):
-        img = self.get_input_val(0)
+    def apply(self, img, whole):
         fac = self.get_input_val(1, 1.0)
-        if img: return ImageEnhance.Contrast(img).enhance(fac)
-        return None
+        # ImageEnhance.Contrast, but the grey it pulls towards is the mean of the whole input
+        mean = int(ImageStat.Stat(whole.convert("L")).mean[0] + 0.5)
+        grey = Image.new("L", img.size, mean)
+        if grey.mode != img.mode: grey = grey.convert(img.mode)
+        if "A" in img.getbands(): grey.putalpha(img.getchannel("A"))
+        return Image.blend(grey, img, fac)
+
+def per_band(img, fn):
+    """runs fn on each band so resizes don't premultiply alpha (the blur filter doesn't either)"""
+    if img.mode in ("RGBA", "LA"):
+        return Image.merge(img.mode, [fn(band) for band in img.split()])
+    return fn(img)
+
+def reduce_padded(band, f):
+    """
+    band.reduce(f) with one more pixel all round holding the reduced edge rows/columns.
+    same as reducing the band with f px of its edge pixels repeated (what the exact blur
+    sees past the border), without making that bigger copy
+    """
+    w, h = band.size
+    small = band.reduce(f)
+    sw, sh = small.size
+    out = Image.new(band.mode, (sw + 2, sh + 2))
+    out.paste(small, (1, 1))
+    out.paste(band.crop((0, 0, w, 1)).reduce((f, 1)), (1, 0))
+    out.paste(band.crop((0, h - 1, w, h)).reduce((f, 1)), (1, sh + 1))
+    out.paste(band.crop((0, 0, 1, h)).reduce((1, f)), (0, 1))
+    out.paste(band.crop((w - 1, 0, w, h)).reduce((1, f)), (sw + 1, 1))
+    for x, y, sx, sy in ((0, 0, 0, 0), (sw + 1, 0, w - 1, 0), (0, sh + 1, 0, h - 1), (sw + 1, sh + 1, w - 1, h - 1)):
+        out.putpixel((x, y), band.getpixel((sx, sy)))
+    return out
+
+def blur_error_bound(accuracy):
+    """(max, mean) abs error of fast_gaussian_blur against the exact filter, in levels out of 255"""
+    return 96 / accuracy + 2, 24 / accuracy
+
+def fast_gaussian_blur(img, radius, accuracy=8):
+    """
+    GaussianBlur for big radii: shrink, blur, grow back.
+    the image is shrunk so the blur is still at least `accuracy` px wide at the small size.
+    error against the exact filter stays inside blur_error_bound(accuracy): that's the
+    worst case measured (gradients, hard edged shapes, checkers and noise, 500-2400px,
+    radius 20-400, accuracy 2-32) with 1.5x or more to spare. at accuracy 8 it's at most
+    14 levels (9 measured) and a mean of 3 (2 measured).
+    accuracy <= 0 or a radius under 2*accuracy just runs the exact filter.
+    """
+    f = int(radius // accuracy) if accuracy > 0 else 0
+    if f < 2: return img.filter(ImageFilter.GaussianBlur(radius))
+    w, h = img.size
+    small = per_band(img, lambda b: reduce_padded(b, f))
+    # take off the spread the box reduce and bilinear upscale already add
+    var = (radius * radius - (f * f - 1) / 12) / (f * f) - 1 / 6
+    small = small.filter(ImageFilter.GaussianBlur(math.sqrt(max(var, 0))))
+    return per_band(small, lambda b: b.resize((w, h), Image.Resampling.BILINEAR, box=(1, 1, 1 + w / f, 1 + h / f)))
 
 @register_node
 class BlurNode(BaseNode):
@@ -77,47 +114,208 @@ class BlurNode(BaseNode):
         super().__init__("Gaussian Blur", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
         self.add_input("Radius", "FLOAT", 5.0)
+        # 0 = the exact blur. higher trades exactness for speed on big radii, 8 is a good start (see fast_gaussian_blur)
+        self.add_input("Accuracy", "FLOAT", 0.0)
         self.add_output("Image", "IMAGE")
 
     def eval(self):
         img = self.get_input_val(0)
         rad = self.get_input_val(1, 5.0)
-        if img: return img.filter(ImageFilter.GaussianBlur(rad))
+        acc = self.get_input_val(2, 0.0)
+        if img: return fast_gaussian_blur(img, rad, acc)
         return None
 
 @register_node
-class GrayscaleNode(BaseNode):
+class GrayscaleNode(PointwiseNode):
     def __init__(self):
         super().__init__("Grayscale", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
         self.add_output("Image", "IMAGE")
 
-    def eval(self):
-        img = self.get_input_val(0)
-        if img: return ImageOps.grayscale(img).convert("RGBA")
-        return None
+    def apply(self, img, whole):
+        return ImageOps.grayscale(img).convert("RGBA")
 
 @register_node
-class InvertNode(BaseNode):
+class InvertNode(PointwiseNode):
     def __init__(self):
         super().__init__("Invert Colors", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
         self.add_output("Image", "IMAGE")
 
+    def apply(self, img, whole):
+        if img.mode == 'RGBA':
+            r,g,b,a = img.split()
+            rgb = Image.merge('RGB', (r,g,b))
+            inv = ImageOps.invert(rgb)
+            r2,g2,b2 = inv.split()
+            return Image.merge('RGBA', (r2,g2,b2,a))
+        return ImageOps.invert(img)
+
+# ====================
+# geometry
+# ====================
+# Transform and Crop don't resample straight away, they describe themselves as an
+# affine map (output pixel -> input pixel). a chain of them gets folded into one map
+# so rotate -> scale -> crop is a single resample of only the pixels the crop keeps.
+# pointwise filters just above the chain (brightness, invert...) are pushed past it too,
+# they only run on the piece of the source the resample reads. whatever a node in the
+# middle of the chain cut off (a crop smaller than its input) is masked out again at the end.
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+def compose(outer, inner):
+    """affine map that applies inner first, then outer"""
+    a, b, c, d, e, f = outer
+    A, B, C, D, E, F = inner
+    return (a*A + b*D, a*B + b*E, a*C + b*F + c,
+            d*A + e*D, d*B + e*E, d*C + e*F + f)
+
+def rotate_geometry(size, angle):
+    """same size and matrix as img.rotate(angle, expand=True)"""
+    w, h = size
+    angle = angle % 360.0
+    if angle == 0: return size, IDENTITY
+    rad = -math.radians(angle)
+    cos, sin = round(math.cos(rad), 15), round(math.sin(rad), 15)
+    cx, cy = w / 2.0, h / 2.0
+    m = [cos, sin, 0.0, -sin, cos, 0.0]
+    m[2] = cos * -cx + sin * -cy + cx
+    m[5] = -sin * -cx + cos * -cy + cy
+    xs, ys = [], []
+    for x, y in ((0, 0), (w, 0), (w, h), (0, h)):
+        xs.append(m[0]*x + m[1]*y + m[2])
+        ys.append(m[3]*x + m[4]*y + m[5])
+    nw = math.ceil(max(xs)) - math.floor(min(xs))
+    nh = math.ceil(max(ys)) - math.floor(min(ys))
+    # recenter on the expanded canvas
+    ox, oy = -(nw - w) / 2.0, -(nh - h) / 2.0
+    m[2], m[5] = m[0]*ox + m[1]*oy + m[2], m[3]*ox + m[4]*oy + m[5]
+    return (nw, nh), tuple(m)
+
+def clip_mask(size, stage, m):
+    """
+    L mask of the `size` output pixels whose centre lands inside a (0, 0, *stage) rect through
+    the output -> stage map m, the same test nearest sampling does. None if they all do
+    """
+    a, b, c, d, e, f = m
+    xs, ys = [], []
+    for x, y in ((0, 0), (size[0], 0), size, (0, size[1])):
+        xs.append(a*x + b*y + c)
+        ys.append(d*x + e*y + f)
+    if min(xs) >= 0 and min(ys) >= 0 and max(xs) <= stage[0] and max(ys) <= stage[1]: return None
+    # only as much of the rect as the output can see
+    l, t = max(0, math.floor(min(xs))), max(0, math.floor(min(ys)))
+    r, btm = min(stage[0], math.ceil(max(xs))), min(stage[1], math.ceil(max(ys)))
+    if r <= l or btm <= t: return Image.new("L", size, 0)
+    rect = Image.new("L", (r - l, btm - t), 255)
+    return rect.transform(size, Image.AFFINE, compose((1, 0, -l, 0, 1, -t), m), Image.Resampling.NEAREST)
+
+def apply_clips(img, clips):
+    """img with everything outside the (stage size, img -> stage map) rects in clips made transparent"""
+    mask = None
+    for stage, m in clips:
+        part = clip_mask(img.size, stage, m)
+        if part is not None: mask = part if mask is None else ImageChops.multiply(mask, part)
+    if mask is None: return img
+    return Image.composite(img, Image.new(img.mode, img.size), mask)
+
+def affine_resample(src, size, m, resample=Image.Resampling.BICUBIC, prepare=None, clips=()):
+    """
+    renders `size` pixels of src through the output -> input map m. prepare(region) runs on
+    the piece of src that gets read, before it's resampled (pushed down pointwise filters).
+    clips are (stage size, output -> stage map) rects the output has to stay inside
+    """
+    return apply_clips(_affine_resample(src, size, m, resample, prepare or (lambda region: region)), clips)
+
+def _affine_resample(src, size, m, resample, prepare):
+    size = (max(0, size[0]), max(0, size[1]))
+    a, b, c, d, e, f = m
+    exact = all(v in (-1.0, 0.0, 1.0) for v in (a, b, d, e)) and float(c).is_integer() and float(f).is_integer()
+    if exact and (a, b, d, e) == (1.0, 0.0, 0.0, 1.0):
+        # plain crop, nothing to resample
+        box = (int(c), int(f), int(c) + size[0], int(f) + size[1])
+        inside = (max(box[0], 0), max(box[1], 0), min(box[2], src.width), min(box[3], src.height))
+        if inside == box: return prepare(src.crop(box))
+        # the filters only get the real pixels, the padding stays transparent
+        if inside[2] <= inside[0] or inside[3] <= inside[1]: return Image.new(prepare(src.crop((0, 0, 1, 1))).mode, size)
+        piece = prepare(src.crop(inside))
+        out = Image.new(piece.mode, size)
+        out.paste(piece, (inside[0] - box[0], inside[1] - box[1]))
+        return out
+
+    # only the part of src the output actually lands on (+ room for the bicubic kernel)
+    xs, ys = [], []
+    for x, y in ((0, 0), (size[0], 0), size, (0, size[1])):
+        xs.append(a*x + b*y + c)
+        ys.append(d*x + e*y + f)
+    l, t = max(0, math.floor(min(xs)) - 2), max(0, math.floor(min(ys)) - 2)
+    r, btm = min(src.width, math.ceil(max(xs)) + 2), min(src.height, math.ceil(max(ys)) + 2)
+    if r <= l or btm <= t: return Image.new(prepare(src.crop((0, 0, 1, 1))).mode, size)
+    box = (l, t, r, btm)
+    region = prepare(src if box == (0, 0, src.width, src.height) else src.crop(box))
+
+    if exact or resample == Image.Resampling.NEAREST:
+        # 90 degree turns / flips land on pixel centres so nearest is lossless there
+        return region.transform(size, Image.AFFINE, compose((1, 0, -l, 0, 1, -t), m), Image.Resampling.NEAREST)
+
+    # bicubic doesn't filter when shrinking, so box-reduce big minifications first
+    factor = int(math.sqrt(abs(a*e - b*d)))
+    if factor >= 2:
+        # crop first, reduce(box=) would premultiply the whole source
+        region = region.reduce(factor)
+        m = compose((1/factor, 0, -l/factor, 0, 1/factor, -t/factor), m)
+    else:
+        m = compose((1, 0, -l, 0, 1, -t), m)
+    return region.transform(size, Image.AFFINE, m, Image.Resampling.BICUBIC)
+
+class GeometricNode(BaseNode):
+    """base for nodes that only move pixels of their image input (input 0) around"""
+    def geometry(self, size):
+        """returns (output size, output -> input matrix, resample filter) for an input of `size`"""
+        raise NotImplementedError
+
+    def resolve_geometry(self):
+        """
+        (source image, output size, output -> source map, filter, pointwise filters to run on
+        the source first, clip rects). folds every geometric node directly upstream into one
+        map onto the real source and collects the pointwise nodes above it. the filter is the
+        smoothest one any node in the chain asked for. every node's output rect is kept as a
+        (size, output -> that node's output map) clip, so what a crop in the middle cut off
+        stays cut off. an upstream node something else also reads gets rendered anyway, so we
+        just start from its result
+        """
+        run = self.current_run()
+        private = lambda node: run is None or run.consumer_count(node) <= 1
+        up = self.input_node(0)
+        ops = [] # walking up, so nearest the source ends up last
+        top = self
+        while isinstance(up, PointwiseNode) and private(up):
+            ops.append(up)
+            top, up = up, up.input_node(0)
+            # a filter that needs stats of its whole input has to sit right on the source
+            if top.needs_whole: break
+        if not ops and isinstance(up, GeometricNode) and private(up):
+            src, size, m, resample, ops, clips = up.resolve_geometry()
+        else:
+            src = top.get_input_val(0)
+            size, m, resample, clips = (src.size if src is not None else None), IDENTITY, Image.Resampling.NEAREST, []
+            ops = ops[::-1]
+        if src is None: return None, None, None, None, None, None
+        out_size, local, own = self.geometry(size)
+        clips = [(stage, compose(cm, local)) for stage, cm in clips] + [(out_size, IDENTITY)]
+        return src, out_size, compose(m, local), max(resample, own), ops, clips
+
     def eval(self):
-        img = self.get_input_val(0)
-        if img: 
-            if img.mode == 'RGBA':
-                r,g,b,a = img.split()
-                rgb = Image.merge('RGB', (r,g,b))
-                inv = ImageOps.invert(rgb)
-                r2,g2,b2 = inv.split()
-                return Image.merge('RGBA', (r2,g2,b2,a))
-            return ImageOps.invert(img)
-        return None
+        src, size, m, resample, ops, clips = self.resolve_geometry()
+        if src is None: return None
+
+        def prepare(region):
+            for op in ops: region = op.apply(region, src)
+            return region
+        return affine_resample(src, size, m, resample, prepare if ops else None, clips)
 
 @register_node
-class TransformNode(BaseNode):
+class TransformNode(GeometricNode):
     def __init__(self):
         super().__init__("Transform", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
@@ -125,20 +323,19 @@ class TransformNode(BaseNode):
         self.add_input("Scale", "FLOAT", 1.0)
         self.add_output("Image", "IMAGE")
 
-    def eval(self):
-        img = self.get_input_val(0)
+    def geometry(self, size):
         rot = self.get_input_val(1, 0.0)
         scale = self.get_input_val(2, 1.0)
-        if img:
-            out = img.rotate(rot, expand=True)
-            if scale != 1.0 and scale > 0:
-                new_size = (int(out.width * scale), int(out.height * scale))
-                out = out.resize(new_size, Image.Resampling.BICUBIC)
-            return out
-        return None
+        # rotate() on its own is nearest neighbour, the scale is bicubic
+        (w, h), m = rotate_geometry(size, rot)
+        if scale != 1.0 and scale > 0:
+            sw, sh = int(w * scale), int(h * scale)
+            m = compose(m, (w / sw if sw else 1 / scale, 0.0, 0.0, 0.0, h / sh if sh else 1 / scale, 0.0))
+            return (sw, sh), m, Image.Resampling.BICUBIC
+        return (w, h), m, Image.Resampling.NEAREST
 
 @register_node
-class CropNode(BaseNode):
+class CropNode(GeometricNode):
     def __init__(self):
         super().__init__("Crop Center", header_color=C_HEADER_FUNC)
         self.add_input("Image", "IMAGE")
@@ -146,16 +343,15 @@ class CropNode(BaseNode):
         self.add_input("Height", "FLOAT", 200)
         self.add_output("Image", "IMAGE")
         
-    def eval(self):
-        img = self.get_input_val(0)
+    def geometry(self, size):
         w = self.get_input_val(1, 200)
         h = self.get_input_val(2, 200)
-        if img:
-            cw, ch = img.size
-            left = (cw - w)/2
-            top = (ch - h)/2
-            return img.crop((left, top, left+w, top+h))
-        return None
+        cw, ch = size
+        left = (cw - w)/2
+        top = (ch - h)/2
+        # rounded the same way Image.crop rounds its box
+        l, t = round(left), round(top)
+        return (round(left + w) - l, round(top + h) - t), (1.0, 0.0, float(l), 0.0, 1.0, float(t)), Image.Resampling.NEAREST
 
 # ====================
 # generators
@@ -180,13 +376,13 @@ class DrawRectNode(BaseNode):
         h = int(self.get_input_val(3, 100))
         col = self.get_input_val(4, (255, 0, 0, 255))
         
-        img = Image.new("RGBA", (512, 512), (0,0,0,0))
-        draw = ImageDraw.Draw(img)
-        draw.rectangle([x, y, x+w, y+h], fill=col)
-        return img
+        # no canvas here, the rect is drawn in the pixel space of whatever it's layered onto
+        return ShapeLayer.rect(x, y, w, h, col)
 
 @register_node
 class MakeColorNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Make Color", header_color=C_HEADER_DEFAULT)
         self.add_input("Red", "FLOAT", 255)
@@ -202,6 +398,8 @@ class MakeColorNode(BaseNode):
 
 @register_node
 class LayerNode(BaseNode):
+    accepts_layers = True
+
     def __init__(self):
         super().__init__("Layer (Add)", header_color=C_HEADER_FUNC)
         self.add_input("Background", "IMAGE")
@@ -209,17 +407,23 @@ class LayerNode(BaseNode):
         self.add_output("Combined", "IMAGE")
 
     def eval(self):
-        bg = self.get_input_val(0)
         fg = self.get_input_val(1)
-        if not bg and not fg: return None
+        if not fg: return self.get_input_val(0)
+        # composite straight onto the background if nothing else needs it
+        bg = self.take_input(0)
         if not bg: return fg
-        if not fg: return bg
-        bg_copy = bg.copy()
-        bg_copy.alpha_composite(fg.resize(bg.size))
-        return bg_copy
+        if isinstance(bg, ShapeLayer):
+            # two generated layers just stack up, still lazy
+            if isinstance(fg, ShapeLayer): return bg.stacked(fg)
+            bg = bg.render()
+        if isinstance(fg, ShapeLayer): return fg.composite_onto(bg)
+        bg.alpha_composite(fg if fg.size == bg.size else fg.resize(bg.size))
+        return bg
 
 @register_node
 class MixNode(BaseNode):
+    accepts_layers = True
+
     def __init__(self):
         super().__init__("Mix (Blend)", header_color=C_HEADER_FUNC)
         self.add_input("Img A", "IMAGE")
@@ -232,12 +436,20 @@ class MixNode(BaseNode):
         b = self.get_input_val(1)
         f = self.get_input_val(2, 0.5)
         if a and b:
-            b_resized = b.resize(a.size)
-            return Image.blend(a.convert("RGBA"), b_resized.convert("RGBA"), f)
+            # generated layers are drawn straight at the other image's size instead of resized
+            if isinstance(a, ShapeLayer): a = a.render(None if isinstance(b, ShapeLayer) else b.size)
+            if isinstance(b, ShapeLayer): b = b.render(a.size)
+            # resize/convert always copy, even when there's nothing to do
+            if b.size != a.size: b = b.resize(a.size)
+            if a.mode != "RGBA": a = a.convert("RGBA")
+            if b.mode != "RGBA": b = b.convert("RGBA")
+            return Image.blend(a, b, f)
         return a if a else b
 
 @register_node
 class FloatNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Input", header_color=C_HEADER_DEFAULT)
         self.add_input("Value", "FLOAT", 0.0)
@@ -274,6 +486,8 @@ class GetImageHeightNode(BaseNode):
 
 @register_node
 class FloatAddNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Add", header_color=C_HEADER_FUNC)
         self.add_input("A", "FLOAT")
@@ -287,6 +501,8 @@ class FloatAddNode(BaseNode):
 
 @register_node
 class FloatSubtractNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Subtract", header_color=C_HEADER_FUNC)
         self.add_input("A", "FLOAT")
@@ -300,6 +516,8 @@ class FloatSubtractNode(BaseNode):
 
 @register_node
 class FloatMultiplyNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Multiply", header_color=C_HEADER_FUNC)
         self.add_input("A", "FLOAT")
@@ -313,6 +531,8 @@ class FloatMultiplyNode(BaseNode):
 
 @register_node
 class FloatDivideNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Divide", header_color=C_HEADER_FUNC)
         self.add_input("A", "FLOAT")
@@ -326,6 +546,8 @@ class FloatDivideNode(BaseNode):
 
 @register_node
 class FloatSqrtNode(BaseNode):
+    is_scalar = True
+
     def __init__(self):
         super().__init__("Float Square Root", header_color=C_HEADER_FUNC)
         self.add_input("A", "FLOAT")
@@ -333,4 +555,5 @@ class FloatSqrtNode(BaseNode):
 
     def eval(self):
         a = self.get_input_val(0)
+        if a is not None and a < 0: raise ValueError(f"square root of a negative number ({a:g})")
         return math.sqrt(a)
\ No newline at end of file
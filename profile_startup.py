@@ -0,0 +1,59 @@
+import os, re, subprocess, sys
+
+# ====================
+# startup profile
+# ====================
+# runs `main.py --profile-startup` under -X importtime and prints the slowest
+# imports plus the startup marks. exits with 1 if we blew the budget.
+# usage: python profile_startup.py [budget_ms]
+
+STARTUP_BUDGET_MS = 1500
+TOP_IMPORTS = 15
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else STARTUP_BUDGET_MS
+    # main.py loads its assets relative to the working dir, so run it from the repo
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "main.py", "--profile-startup"],
+                          capture_output=True, text=True, cwd=here)
+
+    # "import time: self [us] | cumulative | imported package"
+    imports = []
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if m and len(m.group(3)) == 1: # top level imports only
+            imports.append((int(m.group(2)), m.group(4)))
+    imports.sort(reverse=True)
+
+    print("slowest top level imports:")
+    for us, name in imports[:TOP_IMPORTS]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    marks = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith("startup: "):
+            label, val = line[len("startup: "):].rsplit(" ", 1)
+            marks[label] = val
+
+    if "total" not in marks:
+        print("main.py didn't report startup marks:")
+        print(proc.stderr[-2000:])
+        return 1
+
+    print("startup phases:")
+    for label, val in marks.items():
+        unit = "" if label == "nodes_lib loaded" else " ms"
+        print(f"  {label:<18}{val}{unit}")
+
+    total = float(marks["total"])
+    ok = total <= budget
+    print(f"total {total:.1f} ms / budget {budget:.0f} ms -> {'OK' if ok else 'OVER BUDGET'}")
+
+    # the toolbox only knows nodes through NODE_MODULES, a node left out of it just vanishes
+    from registry import check_registry
+    problems = check_registry()
+    for p in problems: print(f"registry: {p}")
+    return 0 if ok and not problems else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
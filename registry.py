@@ -0,0 +1,93 @@
+import importlib
+
+# ====================
+# node registry
+# ====================
+# the toolbox only needs the names at startup, so we keep a table of
+# name -> module and only import the module (PIL filters and all) the first
+# time one of its nodes is actually placed.
+
+NODE_MODULES = {
+    # image processing
+    "BrightnessNode": "nodes_lib",
+    "ContrastNode": "nodes_lib",
+    "BlurNode": "nodes_lib",
+    "GrayscaleNode": "nodes_lib",
+    "InvertNode": "nodes_lib",
+    "TransformNode": "nodes_lib",
+    "CropNode": "nodes_lib",
+    # generators / compositing
+    "DrawRectNode": "nodes_lib",
+    "MakeColorNode": "nodes_lib",
+    "LayerNode": "nodes_lib",
+    "MixNode": "nodes_lib",
+    # math
+    "FloatNode": "nodes_lib",
+    "GetImageWidthNode": "nodes_lib",
+    "GetImageHeightNode": "nodes_lib",
+    "FloatAddNode": "nodes_lib",
+    "FloatSubtractNode": "nodes_lib",
+    "FloatMultiplyNode": "nodes_lib",
+    "FloatDivideNode": "nodes_lib",
+    "FloatSqrtNode": "nodes_lib",
+}
+
+class NodeRegistry:
+    """dict-ish lookup of node classes that imports their module on demand"""
+    def __init__(self, modules):
+        self.modules = dict(modules)
+        self.classes = {}
+
+    def register(self, cls):
+        self.classes[cls.__name__] = cls
+        # nodes registered from an already loaded module still show up in the toolbox
+        self.modules.setdefault(cls.__name__, cls.__module__)
+        return cls
+
+    def keys(self):
+        return self.modules.keys()
+
+    def __contains__(self, name):
+        return name in self.modules
+
+    def __iter__(self):
+        return iter(self.modules)
+
+    def __len__(self):
+        return len(self.modules)
+
+    def get(self, name, default=None):
+        if name not in self.classes:
+            mod = self.modules.get(name)
+            if mod is None: return default
+            importlib.import_module(mod)
+        return self.classes.get(name, default)
+
+    def __getitem__(self, name):
+        cls = self.get(name)
+        if cls is None: raise KeyError(name)
+        return cls
+
+    def is_loaded(self, name):
+        return name in self.classes
+
+NODE_REGISTRY = NodeRegistry(NODE_MODULES)
+
+def register_node(cls):
+    return NODE_REGISTRY.register(cls)
+
+def check_registry():
+    """
+    imports every node module and compares what registered itself against NODE_MODULES.
+    a node missing from the table would silently drop out of the toolbox and the build.
+    returns a list of problems, empty when they agree
+    """
+    for mod in sorted(set(NODE_MODULES.values())): importlib.import_module(mod)
+    registered = {name: cls.__module__ for name, cls in NODE_REGISTRY.classes.items()}
+    problems = []
+    for name, mod in sorted(registered.items()):
+        if name not in NODE_MODULES: problems.append(f"{name} ({mod}) is registered but missing from NODE_MODULES")
+        elif NODE_MODULES[name] != mod: problems.append(f"{name} lives in {mod}, NODE_MODULES says {NODE_MODULES[name]}")
+    for name in sorted(set(NODE_MODULES) - set(registered)):
+        problems.append(f"{name} is in NODE_MODULES but {NODE_MODULES[name]} doesn't register it")
+    return problems
@@ -0,0 +1,316 @@
+import argparse, base64, hashlib, io, json, multiprocessing, os, signal, socketserver, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ====================
+# render server
+# ====================
+# keeps a pool of warm worker processes (qt + node library loaded, recent graphs,
+# inputs and results cached) and renders graphs sent to it over local http.
+#
+#   python render_server.py --port 8765 --root ~/pictures
+#   python render_server.py --socket /tmp/photonodes.sock
+#
+# POST /render  {"graph": {...graph_io format...},
+#                "image_path": "in.png"  or  "image": "<base64>",
+#                "output_path": "out.png" (optional), "format": "PNG" (optional)}
+#   -> the encoded image, or {"output_path": ..., ...} json if output_path was given
+# GET /stats    queue depth, latency percentiles, throughput
+#
+# nothing here talks to anything but the local machine. a web page the user has open can
+# still send requests to localhost, so: /render only takes application/json (browsers
+# can't send that cross-origin without asking first), anything with an Origin header or
+# a Host that isn't us (dns rebinding) is turned away, and image_path/output_path only
+# work inside --root (relative paths are taken from there). no --root, no paths.
+
+class LRU:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items: return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, val):
+        self.items[key] = val
+        self.items.move_to_end(key)
+        while len(self.items) > self.size: self.items.popitem(last=False)
+
+# ====================
+# worker side
+# ====================
+
+class Worker:
+    """one per pool process, everything it loads stays warm between jobs"""
+    def __init__(self):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+        self.app = QApplication.instance() or QApplication([])
+        from registry import NODE_REGISTRY
+        # pull in every node module now instead of on the first job that needs it
+        for name in list(NODE_REGISTRY): NODE_REGISTRY.get(name)
+        self.graphs = LRU(8)   # graph key -> (scene, input node, output node, kept results)
+        self.inputs = LRU(16)  # input key -> decoded RGBA image
+        self.results = LRU(16) # (graph key, input key, format) -> encoded bytes
+
+    def graph(self, key, data):
+        entry = self.graphs.get(key)
+        if entry is None:
+            from graph_io import load_graph
+            scene, inp, out, _ = load_graph(data)
+            # caught when the graph is built, not halfway through a render
+            if scene.fold_errors: raise ValueError("; ".join(scene.fold_errors))
+            entry = (scene, inp, out, {})
+            self.graphs.put(key, entry)
+        return entry
+
+    def image(self, path, data):
+        from PIL import Image
+        if path:
+            st = os.stat(path)
+            key = ("path", os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        else:
+            key = ("bytes", hashlib.sha1(data).hexdigest())
+        img = self.inputs.get(key)
+        if img is None:
+            img = Image.open(path if path else io.BytesIO(data)).convert("RGBA")
+            self.inputs.put(key, img)
+        return key, img
+
+    def render(self, graph_key, graph, image_path, image_data, output_path, fmt):
+        t = time.perf_counter()
+        in_key, img = self.image(image_path, image_data) if (image_path or image_data) else (None, None)
+        res_key = (graph_key, in_key, fmt)
+        data = self.results.get(res_key)
+        info = {"worker": os.getpid(), "cached": data is not None}
+        if data is None:
+            scene, inp, out, keep = self.graph(graph_key, graph)
+            if inp is not None: inp.image = img
+            result = scene.evaluate(out, keep=keep)
+            if result is None: raise ValueError("graph didn't produce an image")
+            if fmt == "JPEG": result = result.convert("RGB")
+            buf = io.BytesIO()
+            result.save(buf, fmt)
+            data = buf.getvalue()
+            self.results.put(res_key, data)
+            info["run"] = scene.last_stats
+        info["render_ms"] = (time.perf_counter() - t) * 1000
+        if output_path:
+            with open(output_path, "wb") as f: f.write(data)
+            return None, info
+        return data, info
+
+_worker = None
+
+def _init_worker():
+    global _worker
+    _worker = Worker()
+
+def _render(*args):
+    return _worker.render(*args)
+
+def _ping():
+    # keeps the process busy a moment so warmup pings land on different workers
+    time.sleep(0.2)
+    return os.getpid()
+
+# ====================
+# server side
+# ====================
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+class Metrics:
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.inflight = 0
+        self.completed = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.latencies = deque(maxlen=window) # ms, last `window` jobs
+        self.done_at = deque()                # finish times for the last minute
+
+    def begin(self):
+        with self.lock: self.inflight += 1
+
+    def end(self, ms, ok, cached=False):
+        now = time.time()
+        with self.lock:
+            self.inflight -= 1
+            if ok:
+                self.completed += 1
+                self.cache_hits += cached
+                self.latencies.append(ms)
+                self.done_at.append(now)
+            else:
+                self.failed += 1
+            while self.done_at and self.done_at[0] < now - 60: self.done_at.popleft()
+
+    def snapshot(self, workers):
+        now = time.time()
+        with self.lock:
+            while self.done_at and self.done_at[0] < now - 60: self.done_at.popleft()
+            lat = list(self.latencies)
+            return {
+                "workers": workers,
+                "inflight": self.inflight,
+                "queue_depth": max(0, self.inflight - workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "cache_hits": self.cache_hits,
+                "latency_ms": {"p50": percentile(lat, 50), "p90": percentile(lat, 90), "p99": percentile(lat, 99)},
+                "throughput_per_s": {"last_minute": len(self.done_at) / min(60.0, max(now - self.started, 1e-9)),
+                                     "overall": self.completed / max(now - self.started, 1e-9)},
+                "uptime_s": now - self.started,
+            }
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "PhotoNodesEX"
+
+    def address_string(self):
+        # unix socket clients don't have an address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose: super().log_message(fmt, *args)
+
+    def send_json(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def check_caller(self):
+        """sends a 403 and returns False for requests coming from a browser page"""
+        if self.headers.get("Origin") is not None:
+            self.send_json(403, {"error": "cross-origin requests aren't allowed"})
+            return False
+        host = (self.headers.get("Host") or "").strip().lower()
+        if host.count(":") == 1: host = host.rsplit(":", 1)[0] # drop the port
+        if host not in self.server.allowed_hosts:
+            self.send_json(403, {"error": f"unexpected Host {host!r}"})
+            return False
+        return True
+
+    def resolve_path(self, path):
+        """path as an absolute path inside --root, raises PermissionError if it isn't"""
+        root = self.server.root
+        if root is None: raise PermissionError("file paths need the server started with --root")
+        full = os.path.realpath(os.path.join(root, os.path.expanduser(path)))
+        if os.path.commonpath([root, full]) != root: raise PermissionError(f"{path!r} is outside --root")
+        return full
+
+    def do_GET(self):
+        if not self.check_caller(): return
+        if self.path == "/stats":
+            self.send_json(200, self.server.metrics.snapshot(self.server.workers))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.check_caller(): return
+        if self.path != "/render":
+            return self.send_json(404, {"error": "not found"})
+        if self.headers.get_content_type() != "application/json":
+            return self.send_json(415, {"error": "jobs have to be sent as application/json"})
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            graph = job["graph"]
+            image_data = base64.b64decode(job["image"]) if job.get("image") else None
+            image_path = self.resolve_path(job["image_path"]) if job.get("image_path") else None
+            output_path = self.resolve_path(job["output_path"]) if job.get("output_path") else None
+        except PermissionError as e:
+            return self.send_json(403, {"error": str(e)})
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {"error": f"bad job: {e}"})
+
+        fmt = job.get("format", "PNG").upper()
+        if fmt == "JPG": fmt = "JPEG"
+        # same graph -> same key, so workers can reuse what they built for it
+        graph_key = hashlib.sha1(json.dumps(graph, sort_keys=True).encode()).hexdigest()
+        metrics = self.server.metrics
+        metrics.begin()
+        t = time.perf_counter()
+        try:
+            data, info = self.server.pool.submit(_render, graph_key, graph, image_path,
+                                                 image_data, output_path, fmt).result()
+        except (ValueError, OSError) as e:
+            metrics.end(0, False)
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            metrics.end(0, False)
+            return self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        ms = (time.perf_counter() - t) * 1000
+        metrics.end(ms, True, info["cached"])
+
+        if data is None:
+            return self.send_json(200, {"output_path": output_path, "latency_ms": ms, **info})
+        self.send_response(200)
+        self.send_header("Content-Type", f"image/{fmt.lower()}")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Latency-Ms", f"{ms:.1f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+# no unix sockets on windows, --socket just isn't available there
+if hasattr(socketserver, "UnixStreamServer"):
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def make_server(args):
+    if args.socket:
+        if os.path.exists(args.socket): os.unlink(args.socket)
+        server = UnixHTTPServer(args.socket, RenderHandler)
+        where = f"unix socket {args.socket}"
+        # clients on a unix socket send whatever Host they like, usually localhost
+        server.allowed_hosts = {"localhost", "127.0.0.1", "", args.socket.lower()}
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), RenderHandler)
+        where = f"http://127.0.0.1:{server.server_address[1]}"
+        server.allowed_hosts = {"localhost", "127.0.0.1"}
+    server.workers = args.workers
+    server.verbose = args.verbose
+    server.root = os.path.realpath(os.path.expanduser(args.root)) if args.root else None
+    server.metrics = Metrics()
+    # spawn, not fork: qt doesn't survive a fork and windows can't anyway
+    server.pool = ProcessPoolExecutor(args.workers, multiprocessing.get_context("spawn"), initializer=_init_worker)
+    # start and warm every worker before taking jobs
+    pids = {f.result() for f in [server.pool.submit(_ping) for _ in range(args.workers)]}
+    return server, where, pids
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PhotoNodes EX render server")
+    parser.add_argument("--port", type=int, default=8765, help="localhost port to listen on")
+    parser.add_argument("--socket", help="listen on this unix socket instead of a port")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--root", help="image_path/output_path in jobs have to be inside this directory")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.socket and not hasattr(socketserver, "UnixStreamServer"):
+        parser.error("--socket needs unix domain sockets, which this platform doesn't have. use --port")
+
+    def _stop(*_): raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+
+    server, where, pids = make_server(args)
+    print(f"rendering on {where} with {len(pids)} warm workers", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown(cancel_futures=True)
+        if args.socket and os.path.exists(args.socket): os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
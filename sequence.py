@@ -0,0 +1,186 @@
+import argparse, json, os, sys, time
+import PIL
+from PIL import Image, ImageSequence, GifImagePlugin, TiffImagePlugin
+
+# ====================
+# image sequences
+# ====================
+# runs a graph over every frame of an animated gif/webp or a multi-page tiff.
+# frames are decoded, rendered and encoded one at a time, so memory stays the same
+# no matter how many frames there are. anything in the graph that doesn't depend on
+# the input image (generated layers, folded constants...) is only worked out for the
+# first frame and kept for the rest (GraphRun keep).
+#
+#   python sequence.py graph.json in.gif out.gif
+#
+# pillow's own multi-frame save holds every frame until the end (gif) or wants
+# them all up front (webp, tiff), so each format gets a small writer of its own here.
+
+SEQUENCE_FORMATS = {".gif": "GIF", ".webp": "WEBP", ".tif": "TIFF", ".tiff": "TIFF"}
+DEFAULT_DURATION = 100 # ms, for sources that don't say
+
+def frame_count(path):
+    with Image.open(path) as src:
+        return getattr(src, "n_frames", 1)
+
+def read_frames(path):
+    """yields (RGBA frame, duration in ms), only the current frame is ever decoded"""
+    with Image.open(path) as src:
+        for frame in ImageSequence.Iterator(src):
+            yield frame.convert("RGBA"), frame.info.get("duration") or DEFAULT_DURATION
+
+class GifWriter:
+    """animated gif written as frames come in, each frame gets its own palette"""
+    def __init__(self, fp, loop=0):
+        self.fp = fp
+        self.loop = loop
+        self.started = False
+
+    def add(self, img, duration):
+        p = img.convert("RGB").quantize(255, method=Image.Quantize.FASTOCTREE)
+        params = {"duration": duration, "disposal": 2, "include_color_table": True}
+        if img.mode == "RGBA" and img.getextrema()[3][0] < 128:
+            # index 255 is left free by the quantize, it's the see-through one
+            p.paste(255, mask=img.getchannel("A").point(lambda a: 255 if a < 128 else 0))
+            params["transparency"] = 255
+        palette = p.getpalette()
+        p.putpalette(palette + [0] * (768 - len(palette)))
+        if not self.started:
+            header, _ = GifImagePlugin.getheader(p, None, {"loop": self.loop, "duration": duration})
+            self.fp.write(b"".join(header))
+            self.started = True
+        for chunk in GifImagePlugin.getdata(p, (0, 0), **params): self.fp.write(chunk)
+
+    def close(self):
+        self.fp.write(b";")
+
+class TiffWriter:
+    """one page per frame, appended as it comes in"""
+    def __init__(self, fp):
+        self.tiff = TiffImagePlugin.AppendingTiffWriter(fp)
+
+    def add(self, img, duration):
+        img.save(self.tiff, "TIFF")
+        self.tiff.newFrame()
+
+    def close(self):
+        self.tiff.close()
+
+class WebpWriter:
+    """
+    frames go straight into libwebp's animation encoder, which only keeps them compressed.
+    same calls as pillow's WebPImagePlugin._save_all, minus collecting the frames first.
+    that encoder is pillow internals and its arguments changed: frames are image pointers
+    (Image.getim) from 11.0 on and raw bytes before, the size is one tuple from 11.2 on and
+    width, height before. a pillow that takes anything else gets an OSError
+    """
+    def __init__(self, fp, size, loop=0, quality=80, lossless=False):
+        try:
+            from PIL import _webp
+            encoder = _webp.WebPAnimEncoder
+        except (ImportError, AttributeError):
+            raise OSError("this Pillow can't write animated WebP")
+        self.fp = fp
+        self.lossless, self.quality = lossless, quality
+        version = tuple(int(v) for v in PIL.__version__.split(".")[:2] if v.isdigit())
+        self.pointers = version >= (11, 0)
+        kmin, kmax = (9, 17) if lossless else (3, 5)
+        size = (tuple(size),) if version >= (11, 2) else tuple(size)
+        self.enc = self.call(encoder, *size, 0, loop, False, kmin, kmax, False, False)
+        self.timestamp = 0
+
+    @staticmethod
+    def call(fn, *args):
+        try: return fn(*args)
+        except (TypeError, AttributeError) as e:
+            raise OSError(f"animated WebP isn't supported with Pillow {PIL.__version__} ({e}), use GIF or TIFF")
+
+    def add(self, img, duration):
+        if img.mode not in ("RGBA", "RGB"): img = img.convert("RGBA")
+        ts = round(self.timestamp)
+        if self.pointers:
+            self.call(self.enc.add, img.getim(), ts, self.lossless, self.quality, 100, 0)
+        else:
+            self.call(self.enc.add, img.tobytes("raw", img.mode), ts, *img.size, img.mode,
+                      self.lossless, self.quality, 100, 0)
+        self.timestamp += duration
+
+    def close(self):
+        ts = round(self.timestamp)
+        if self.pointers: self.call(self.enc.add, None, ts, self.lossless, self.quality, 100, 0)
+        else: self.call(self.enc.add, None, ts, 0, 0, "", self.lossless, self.quality, 100, 0)
+        data = self.call(self.enc.assemble, "", "", "")
+        if data is None: raise OSError("webp encoder returned nothing")
+        self.fp.write(data)
+
+def sequence_format(path):
+    fmt = SEQUENCE_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None: raise ValueError(f"can't write a sequence to {path!r}, use one of {', '.join(SEQUENCE_FORMATS)}")
+    return fmt
+
+def make_writer(fmt, fp, size, loop=0):
+    if fmt == "GIF": return GifWriter(fp, loop)
+    if fmt == "TIFF": return TiffWriter(fp)
+    if fmt == "WEBP": return WebpWriter(fp, size, loop)
+    raise ValueError(f"unknown sequence format {fmt!r}")
+
+def render_sequence(scene, inp, out, src_path, dst_path, fmt=None, progress=None):
+    """
+    renders every frame of src_path through the graph into dst_path. progress(done, total)
+    is called after each frame. returns totals of the per-frame GraphRun stats
+    """
+    fmt = fmt or sequence_format(dst_path)
+    total = frame_count(src_path)
+    keep = {}
+    stats = {"frames": 0}
+    still = inp.image
+    writer = None
+    try:
+        with open(dst_path, "w+b") as fp: # tiff pages get patched up as they are appended
+            for frame, duration in read_frames(src_path):
+                inp.image = frame
+                result = scene.evaluate(out, keep=keep)
+                if result is None: raise ValueError("graph didn't produce an image")
+                if writer is None:
+                    size = result.size
+                    writer = make_writer(fmt, fp, size)
+                elif fmt != "TIFF" and result.size != size:
+                    # an animation has one canvas size, tiff pages don't care
+                    result = result.resize(size)
+                writer.add(result, duration)
+                stats["frames"] += 1
+                for k, v in scene.last_stats.items(): stats[k] = stats.get(k, 0) + v
+                del frame, result
+                if progress: progress(stats["frames"], total)
+            if writer is not None: writer.close()
+    finally:
+        inp.image = still
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run a saved graph over every frame of an animation")
+    parser.add_argument("graph", help="graph json (Save Graph in the app)")
+    parser.add_argument("src", help="animated gif/webp or multi-page tiff")
+    parser.add_argument("dst", help=f"output, one of {', '.join(SEQUENCE_FORMATS)}")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from graph_io import load_graph
+    with open(args.graph) as f: scene, inp, out, _ = load_graph(json.load(f))
+    if scene.fold_errors: sys.exit("; ".join(scene.fold_errors))
+    if inp is None: sys.exit("graph has no InputNode")
+
+    t = time.perf_counter()
+    def report(done, total): print(f"\r  frame {done}/{total}", end="", flush=True)
+    try:
+        stats = render_sequence(scene, inp, out, args.src, args.dst, progress=report)
+    except (ValueError, OSError) as e:
+        sys.exit(f"\nexport failed: {e}")
+    ms = (time.perf_counter() - t) * 1000
+    print(f"\n{stats['frames']} frames in {ms:.0f} ms ({ms / max(stats['frames'], 1):.1f} ms/frame), "
+          f"{stats.get('kept', 0)} results reused from the first frame")
+
+if __name__ == "__main__":
+    main()
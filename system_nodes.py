@@ -0,0 +1,47 @@
+from PIL import Image
+from core_ui import BaseNode
+from config import *
+
+# ====================
+# system nodes
+# ====================
+# these are always on the canvas so they live apart from nodes_lib,
+# which is only imported once the user places a node from the toolbox.
+
+class InputNode(BaseNode):
+    # the loaded image is reused by every run and changes under the graph
+    owns_result = False
+    is_source = True
+
+    def __init__(self):
+        super().__init__("Input Image", header_color=C_HEADER_EVENT)
+        self.add_output("Image", "IMAGE")
+        self.image = None
+        self.path = None
+        self.frames = 1
+        self.is_permanent = True
+    
+    def set_image(self, path):
+        try:
+            with Image.open(path) as src:
+                # animations / multi-page files preview their first frame,
+                # sequence.py streams the rest through the graph on export
+                self.frames = getattr(src, "n_frames", 1)
+                self.image = src.convert("RGBA")
+            self.path = path
+        except: pass
+    
+    def eval(self): return self.image
+
+class OutputNode(BaseNode):
+    def __init__(self, cb=None):
+        super().__init__("Output Result", header_color=C_HEADER_EVENT)
+        self.add_input("Image", "IMAGE")
+        self.cb = cb
+        self.is_permanent = True
+    
+    def refresh(self):
+        if self.cb: self.cb(self.scene().evaluate(self) if self.scene() else self.eval())
+        
+    def eval(self):
+        return self.get_input_val(0)